@@ -2,21 +2,48 @@
 
 from __future__ import annotations
 
+import atexit
+import hashlib
 import logging
-from functools import lru_cache
-from typing import Any, Dict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
 
 import jwt
 import requests
-from jwt import InvalidTokenError, PyJWKClient, PyJWKClientError
+from cachetools import TTLCache
+from jwt import (
+    ImmatureSignatureError,
+    InvalidIssuedAtError,
+    InvalidSignatureError,
+    InvalidTokenError,
+    PyJWKClient,
+    PyJWKClientError,
+)
 from requests import Response
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
 
-from .config import Settings, get_settings
+from .config import Settings, get_settings, thread_safe_cache
 
 logger = logging.getLogger(__name__)
 
+# Shared session so calls to the Cognito domain reuse pooled keep-alive
+# connections instead of paying a fresh TCP + TLS handshake on every request.
+_HTTP = requests.Session()
+_HTTP.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504)),
+    ),
+)
+atexit.register(_HTTP.close)
+
 
 class TokenVerificationError(Exception):
     """Raised when a Cognito token fails validation."""
@@ -30,11 +57,103 @@ class UserInfoError(Exception):
     """Raised when fetching the Cognito user info document fails."""
 
 
-@lru_cache
-def _get_jwk_client(jwks_uri: str) -> PyJWKClient:
-    """Return a cached PyJWKClient for the provided JWKS URI."""
+# Floor on how often a JWKS refresh may be attempted. Tokens forged with
+# random kids would otherwise trigger one upstream fetch each.
+_MIN_REFRESH_INTERVAL = 60.0
+
+
+class _CachingJWKClient:
+    """PyJWKClient wrapper that caches verification keys per ``kid``.
+
+    The cache stores the materialized cryptography key object, so a hit
+    skips the JWT header re-parse and PyJWK lookup entirely. On a miss only
+    one thread performs the JWKS fetch for a given key id; concurrent
+    callers block on the per-kid lock and reuse the fetched key, so a cold
+    start or key rotation does not trigger a thundering herd of JWKS
+    requests against Cognito. Refreshes for unknown kids are additionally
+    rate-limited so abusive traffic cannot drive unbounded JWKS fetches.
+    """
 
-    return PyJWKClient(jwks_uri)
+    def __init__(self, jwks_uri: str) -> None:
+        # cache_keys stays off: it would wrap the inner get_signing_key in an
+        # lru_cache with no eviction hook, so evict_for could never drop a
+        # stale PyJWK after a rotation. This wrapper already memoizes the
+        # materialized key per kid, which is the cache that matters.
+        self._client = PyJWKClient(jwks_uri, cache_keys=False, lifespan=600)
+        self._keys: Dict[str, Any] = {}
+        self._locks: Dict[str, Lock] = {}
+        self._locks_guard = Lock()
+        self._last_refresh = float("-inf")
+
+    def _lock_for(self, kid: str) -> Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(kid, Lock())
+
+    def _kid_in_cached_set(self, kid: str | None) -> bool:
+        # PyJWKClient caches the raw JWKS JSON document, so the cached value
+        # is a plain dict with a "keys" list, not a PyJWKSet.
+        jwk_set_cache = getattr(self._client, "jwk_set_cache", None)
+        cached_set = jwk_set_cache.get() if jwk_set_cache is not None else None
+        if not isinstance(cached_set, dict):
+            return False
+        return any(jwk.get("kid") == kid for jwk in cached_set.get("keys", []))
+
+    def _resolve(self, kid: str | None, token: str, refresh: bool = False) -> Any:
+        """Resolve a key via the underlying client, rate-limiting refreshes.
+
+        A real fetch is needed when the kid is absent from the cached JWKS
+        document, or when the caller forces ``refresh`` because the key
+        material behind an existing kid is suspected stale; either way,
+        fail fast if a fetch already happened recently so rotation still
+        works but unknown-kid spray does not DoS the upstream.
+        """
+
+        if refresh or not self._kid_in_cached_set(kid):
+            now = time.monotonic()
+            if now - self._last_refresh < _MIN_REFRESH_INTERVAL:
+                raise PyJWKClientError(
+                    "No signing key matches the token and the JWKS document "
+                    "was already refreshed recently."
+                )
+            self._last_refresh = now
+            if refresh:
+                # Bypass the document cache: the kid is present in the
+                # cached set, so get_signing_key_from_jwt alone would just
+                # rebuild the same stale key.
+                self._client.get_jwk_set(refresh=True)
+        return self._client.get_signing_key_from_jwt(token)
+
+    def signing_key_for(self, token: str, refresh: bool = False) -> Any:
+        """Return the verification key for the token, cached by ``kid``.
+
+        With ``refresh`` the cached key is bypassed and rebuilt from a
+        freshly fetched JWKS document (used after a suspected rotation).
+        """
+
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            return self._resolve(kid, token, refresh).key
+
+        if not refresh:
+            key = self._keys.get(kid)
+            if key is not None:
+                return key
+
+        with self._lock_for(kid):
+            if not refresh:
+                key = self._keys.get(kid)
+                if key is not None:
+                    return key
+            key = self._resolve(kid, token, refresh).key
+            self._keys[kid] = key
+            return key
+
+
+@thread_safe_cache
+def _get_jwk_client(jwks_uri: str) -> _CachingJWKClient:
+    """Return a cached JWKS client for the provided JWKS URI."""
+
+    return _CachingJWKClient(jwks_uri)
 
 
 def _raise_for_status(response: Response, message: str) -> None:
@@ -52,7 +171,7 @@ def exchange_code_for_tokens(code: str, redirect_uri: str | None = None) -> Dict
     settings: Settings = get_settings()
     redirect_target = redirect_uri or settings.cognito_redirect_uri
 
-    if redirect_target not in settings.cognito_redirect_uris:
+    if redirect_target not in settings.cognito_redirect_uri_set:
         configured_list = ", ".join(settings.cognito_redirect_uris)
         logger.debug(
             "Rejecting token exchange because redirect URI %s is not in configured list: %s",
@@ -77,7 +196,7 @@ def exchange_code_for_tokens(code: str, redirect_uri: str | None = None) -> Dict
         auth = HTTPBasicAuth(settings.cognito_client_id, settings.cognito_client_secret)
 
     try:
-        response = requests.post(
+        response = _HTTP.post(
             settings.token_endpoint,
             data=data,
             headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -106,7 +225,7 @@ def fetch_userinfo(access_token: str) -> Dict[str, Any]:
     settings: Settings = get_settings()
 
     try:
-        response = requests.get(
+        response = _HTTP.get(
             settings.userinfo_endpoint,
             headers={"Authorization": f"Bearer {access_token}"},
             timeout=10,
@@ -121,11 +240,86 @@ def fetch_userinfo(access_token: str) -> Dict[str, Any]:
     except ValueError as exc:  # pragma: no cover - defensive coding
         raise UserInfoError("Cognito userInfo response was not valid JSON.") from exc
 
+# Shared pool for overlapping independent Cognito calls during login.
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cognito")
+atexit.register(_EXECUTOR.shutdown)
+
+
+def complete_login(
+    code: str, redirect_uri: str | None = None
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Run the full login flow with the post-exchange calls in parallel.
+
+    Exchanges the authorization code, then verifies the ID token and
+    fetches the userinfo document concurrently: the two calls are
+    independent, so overlapping them hides one round-trip to Cognito
+    (both reuse the shared keep-alive session).
+
+    Returns:
+        A ``(tokens, payload, userinfo)`` tuple where ``userinfo`` is
+        ``None`` when Cognito issued no access token or the userinfo
+        request failed.
+
+    Raises:
+        TokenExchangeError: If the code exchange fails.
+        TokenVerificationError: If the returned ID token is invalid.
+    """
+
+    tokens = exchange_code_for_tokens(code, redirect_uri)
+
+    validation_future = _EXECUTOR.submit(validate_id_token, tokens["id_token"])
+    userinfo_future = None
+    access_token = tokens.get("access_token")
+    if access_token:
+        userinfo_future = _EXECUTOR.submit(fetch_userinfo, access_token)
+
+    payload = validation_future.result()
+
+    userinfo = None
+    if userinfo_future is not None:
+        try:
+            userinfo = userinfo_future.result()
+        except UserInfoError as exc:
+            logger.info("Unable to fetch user info from Cognito: %s", exc)
+
+    return tokens, payload, userinfo
+
+
 CLOCK_SKEW_LEEWAY = 60
 
+# Verified tokens cached by fingerprint so repeat verifications of the same
+# token (common when a SPA hits several endpoints per page) skip the
+# RS256 signature check. Entries expire with the cache TTL or, if sooner,
+# with the token's own ``exp`` claim.
+_TOKEN_CACHE: TTLCache = TTLCache(maxsize=4096, ttl=300)
+_TOKEN_CACHE_LOCK = Lock()
+
+# Recently rejected token fingerprints. A short TTL turns a spray of the
+# same invalid token into a hash lookup instead of a full RSA verification
+# per request, while still re-checking every 30s.
+_NEG_CACHE: TTLCache = TTLCache(maxsize=4096, ttl=30)
+_NEG_CACHE_LOCK = Lock()
+
+
+def _remember_rejected(cache_key: bytes) -> None:
+    with _NEG_CACHE_LOCK:
+        _NEG_CACHE[cache_key] = True
+
+
+def _token_cache_key(id_token: str) -> bytes:
+    """Return a compact fingerprint of the encoded token for cache keying.
+
+    A 16-byte blake2b digest keeps key memory constant instead of holding
+    the 1-2KB token string, and hashing cost stays flat regardless of token
+    length. Collision resistance is not security-critical here: a cached
+    payload is still bounded by its own exp claim.
+    """
+
+    return hashlib.blake2b(id_token.encode("ascii"), digest_size=16).digest()
+
 
 def validate_id_token(id_token: str) -> Dict[str, Any]:
-    
+
     """Validate the provided Cognito ID token.
 
     Args:
@@ -138,35 +332,74 @@ def validate_id_token(id_token: str) -> Dict[str, Any]:
         TokenVerificationError: If the token cannot be verified.
     """
     
+    cache_key = _token_cache_key(id_token)
+    with _TOKEN_CACHE_LOCK:
+        cached = _TOKEN_CACHE.get(cache_key)
+    if cached is not None:
+        payload, expires_at = cached
+        if time.time() < expires_at:
+            return payload
+
+    with _NEG_CACHE_LOCK:
+        recently_rejected = cache_key in _NEG_CACHE
+    if recently_rejected:
+        raise TokenVerificationError("Unable to verify token.")
+
     settings: Settings = get_settings()
     jwk_client = _get_jwk_client(settings.jwks_uri)
 
     try:
-        signing_key = jwk_client.get_signing_key_from_jwt(id_token)
+        signing_key = jwk_client.signing_key_for(id_token)
     except PyJWKClientError as exc:
         logger.debug("Unable to resolve signing key for JWT: %s", exc)
+        _remember_rejected(cache_key)
         raise TokenVerificationError("No signing key found for the provided token.") from exc
 
-    try:
-        payload = jwt.decode(
-            id_token,
-            signing_key.key,
-            algorithms=["RS256"],
-            issuer=settings.issuer,
-            audience=settings.cognito_client_id,
-            leeway=CLOCK_SKEW_LEEWAY,
-        )
-    except (ImmatureSignatureError, InvalidIssuedAtError) as exc:
-        logger.debug("ID token rejected due to clock skew: %s", exc)
-        raise TokenVerificationError(
-            "Unable to verify token because it appears to be issued in the future. "
-            "Check that the server clock is in sync."
-        ) from exc
-    except InvalidTokenError as exc:
-        logger.debug("Failed to decode JWT: %s", exc)
-        raise TokenVerificationError("Unable to verify token.") from exc
+    refreshed = False
+    while True:
+        try:
+            payload = jwt.decode(
+                id_token,
+                signing_key,
+                algorithms=["RS256"],
+                issuer=settings.issuer,
+                audience=settings.cognito_client_id,
+                leeway=CLOCK_SKEW_LEEWAY,
+            )
+        except (ImmatureSignatureError, InvalidIssuedAtError) as exc:
+            logger.debug("ID token rejected due to clock skew: %s", exc)
+            raise TokenVerificationError(
+                "Unable to verify token because it appears to be issued in the future. "
+                "Check that the server clock is in sync."
+            ) from exc
+        except InvalidTokenError as exc:
+            if isinstance(exc, InvalidSignatureError) and not refreshed:
+                # A stale cached key after a Cognito key rotation surfaces as
+                # a bad signature; rebuild the key from a freshly fetched
+                # JWKS document once before rejecting.
+                refreshed = True
+                try:
+                    signing_key = jwk_client.signing_key_for(id_token, refresh=True)
+                except PyJWKClientError as key_exc:
+                    logger.debug("Unable to resolve signing key for JWT: %s", key_exc)
+                    _remember_rejected(cache_key)
+                    raise TokenVerificationError(
+                        "No signing key found for the provided token."
+                    ) from key_exc
+                continue
+            logger.debug("Failed to decode JWT: %s", exc)
+            with _TOKEN_CACHE_LOCK:
+                _TOKEN_CACHE.pop(cache_key, None)
+            _remember_rejected(cache_key)
+            raise TokenVerificationError("Unable to verify token.") from exc
+        break
 
     if payload.get("token_use") != "id":
         raise TokenVerificationError("The provided token is not an ID token.")
 
+    expires_at = payload.get("exp")
+    if expires_at:
+        with _TOKEN_CACHE_LOCK:
+            _TOKEN_CACHE[cache_key] = (payload, expires_at)
+
     return payload
\ No newline at end of file
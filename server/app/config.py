@@ -4,8 +4,9 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
-from functools import lru_cache
-from typing import List, Tuple
+from functools import wraps
+from threading import Lock
+from typing import FrozenSet, List, Tuple
 
 from dotenv import load_dotenv
 
@@ -13,6 +14,32 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def thread_safe_cache(func):
+    """Memoize ``func`` by its positional arguments under an explicit lock.
+
+    Unlike ``functools.lru_cache``, the lookup-or-compute step is atomic on
+    free-threaded Python builds too, so concurrent first calls cannot run
+    the wrapped function twice.
+    """
+
+    results: dict = {}
+    lock = Lock()
+
+    @wraps(func)
+    def wrapper(*args):
+        try:
+            return results[args]
+        except KeyError:
+            pass
+        with lock:
+            if args not in results:
+                results[args] = func(*args)
+            return results[args]
+
+    wrapper.cache_clear = results.clear
+    return wrapper
+
+
 @dataclass(frozen=True)
 class Settings:
     """Runtime configuration derived from environment variables."""
@@ -24,6 +51,9 @@ class Settings:
     cognito_client_secret: str | None
     cognito_domain: str
     cognito_redirect_uris: Tuple[str, ...]
+    # The tuple keeps ordering (the first entry is the default redirect
+    # URI); the frozenset gives O(1) membership checks on the auth hot path.
+    cognito_redirect_uri_set: FrozenSet[str]
     allowed_origins: List[str]
 
     @property
@@ -117,7 +147,7 @@ def _parse_redirect_uris(raw_uris: str) -> Tuple[str, ...]:
     return tuple(uris)
 
 
-@lru_cache
+@thread_safe_cache
 def get_settings() -> Settings:
     """Return cached application settings.
 
@@ -125,28 +155,33 @@ def get_settings() -> Settings:
         RuntimeError: If any required environment variable is missing.
     """
 
-    missing = [key for key in REQUIRED_ENV_VARS if not os.getenv(key)]
+    # Snapshot the environment once; every later read is a plain dict lookup
+    # instead of going through the os.environ mapping wrapper.
+    env = dict(os.environ)
+
+    missing = [key for key in REQUIRED_ENV_VARS if not env.get(key)]
     if missing:
         joined = ", ".join(missing)
         raise RuntimeError(f"Missing required environment variables: {joined}")
 
-    port_raw = os.getenv("PORT", "4000")
+    port_raw = env.get("PORT", "4000")
     try:
         port = int(port_raw)
     except ValueError as exc:  # pragma: no cover - defensive coding
         raise RuntimeError("PORT must be an integer value") from exc
 
-    allowed_origins = _parse_allowed_origins(os.getenv("ALLOWED_ORIGIN"))
+    allowed_origins = _parse_allowed_origins(env.get("ALLOWED_ORIGIN"))
+
+    redirect_uris = _parse_redirect_uris(env["COGNITO_REDIRECT_URI"])
 
-    redirect_uris = _parse_redirect_uris(os.environ["COGNITO_REDIRECT_URI"])
-    
     return Settings(
         port=port,
-        cognito_region=os.environ["COGNITO_REGION"],
-        cognito_user_pool_id=os.environ["COGNITO_USER_POOL_ID"],
-        cognito_client_id=os.environ["COGNITO_CLIENT_ID"],
-        cognito_client_secret=os.getenv("COGNITO_CLIENT_SECRET"),
-        cognito_domain=os.environ["COGNITO_DOMAIN"],
+        cognito_region=env["COGNITO_REGION"],
+        cognito_user_pool_id=env["COGNITO_USER_POOL_ID"],
+        cognito_client_id=env["COGNITO_CLIENT_ID"],
+        cognito_client_secret=env.get("COGNITO_CLIENT_SECRET"),
+        cognito_domain=env["COGNITO_DOMAIN"],
         cognito_redirect_uris=redirect_uris,
+        cognito_redirect_uri_set=frozenset(redirect_uris),
         allowed_origins=allowed_origins,
     )
\ No newline at end of file
@@ -1,179 +1,396 @@
-"""SQLite helpers for persisting user profiles."""
-
-from __future__ import annotations
-
-import sqlite3
-from contextlib import closing
-from pathlib import Path
-from threading import Lock
-from typing import Any, Dict, List, Tuple
-
-DATA_DIRECTORY = Path(__file__).resolve().parents[1] / "data"
-DATABASE_PATH = DATA_DIRECTORY / "app.db"
-
-_DB_LOCK = Lock()
-
-class DatabaseError(RuntimeError):
-    """Raised when a database operation fails."""
-
-
-def init_db() -> None:
-    """Ensure the SQLite database and users table exist."""
-
-    DATA_DIRECTORY.mkdir(parents=True, exist_ok=True)
-
-    with closing(sqlite3.connect(DATABASE_PATH)) as connection:
-        connection.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                sub TEXT PRIMARY KEY,
-                email TEXT,
-                name TEXT,
-                given_name TEXT,
-                family_name TEXT,
-                picture TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        connection.commit()
-
-
-def upsert_user(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Insert or update a user record using the Cognito payload."""
-
-    sub = payload.get("sub")
-    if not sub:
-        raise ValueError("ID token payload did not include a subject identifier.")
-
-    user = {
-        "sub": sub,
-        "email": payload.get("email"),
-        "name": payload.get("name"),
-        "given_name": payload.get("given_name"),
-        "family_name": payload.get("family_name"),
-        "picture": payload.get("picture"),
-    }
-
-    query = """
-        INSERT INTO users (sub, email, name, given_name, family_name, picture, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        ON CONFLICT(sub) DO UPDATE SET
-            email=excluded.email,
-            name=excluded.name,
-            given_name=excluded.given_name,
-            family_name=excluded.family_name,
-            picture=excluded.picture,
-            updated_at=CURRENT_TIMESTAMP
-    """
-
-    with _DB_LOCK:
-        with closing(sqlite3.connect(DATABASE_PATH)) as connection:
-            connection.execute(
-                query,
-                (
-                    user["sub"],
-                    user["email"],
-                    user["name"],
-                    user["given_name"],
-                    user["family_name"],
-                    user["picture"],
-                ),
-            )
-            connection.commit()
-
-    return user
-
-
-def insert_task(
-    description: str,
-    task_date: str,
-    task_time: str,
-    user_email: str | None,
-) -> Tuple[int, str | None]:
-    """Insert a task row and return its identifier and normalized email."""
-
-    insert_sql = (
-        "INSERT INTO tasks (description, date, time, user_email, isactive) "
-        "VALUES (?, ?, ?, ?, 1)"
-    )
-    normalized_email = (user_email or "").strip()
-    print("this is the email: + " + str(normalized_email))
-    try:
-        with _DB_LOCK:
-            with closing(sqlite3.connect(DATABASE_PATH)) as connection:
-                # Parameter binding avoids SQL injection by keeping user input separate
-                # from the SQL statement itself.
-                cursor = connection.execute(
-                    insert_sql,
-                    (
-                        description,
-                        task_date,
-                        task_time,
-                        normalized_email,
-                    ),
-                )
-                connection.commit()
-    except sqlite3.Error as exc:  # pragma: no cover - defensive
-        raise DatabaseError("Failed to insert task") from exc
-
-    return cursor.lastrowid, (normalized_email or None)
-
-
-def fetch_tasks_by_email_and_date(
-    user_email: str,
-    task_date: str,
-) -> List[Dict[str, Any]]:
-    """Retrieve the active tasks for a user on a specific date."""
-
-    normalized_email = user_email.strip()
-    if not normalized_email:
-        return []
-
-    query = (
-        "SELECT id, description, date, time, user_email "
-        "FROM tasks WHERE user_email = ? AND date = ? AND isactive = 1 "
-        "ORDER BY time, id"
-    )
-
-    try:
-        with _DB_LOCK:
-            with closing(sqlite3.connect(DATABASE_PATH)) as connection:
-                connection.row_factory = sqlite3.Row
-                rows = connection.execute(query, (normalized_email, task_date)).fetchall()
-    except sqlite3.Error as exc:  # pragma: no cover - defensive
-        raise DatabaseError("Failed to fetch tasks") from exc
-    
-    # list of dictionary
-    return [
-        {
-            "id": row["id"],
-            "description": row["description"],
-            "date": row["date"],
-            "time": row["time"],
-            "user_email": row["user_email"] or None,
-        }
-        for row in rows
-    ]
-
-
-
-def deactivate_task(task_id: int) -> bool:
-    """Mark a task as inactive.
-
-    Returns ``True`` when a row is updated and ``False`` when no matching task
-    exists.
-    """
-    
-    query = "UPDATE tasks SET isactive = 0 WHERE id = ? AND isactive = 1"
-
-    try:
-        with _DB_LOCK:
-            with closing(sqlite3.connect(DATABASE_PATH)) as connection:
-                cursor = connection.execute(query, (task_id,))
-                connection.commit()
-    except sqlite3.Error as exc:  # pragma: no cover - defensive
-        raise DatabaseError("Failed to delete task") from exc
-
-    return cursor.rowcount > 0
\ No newline at end of file
+"""SQLite helpers for persisting user profiles."""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from queue import Queue
+from threading import Lock
+from typing import Any, Dict, List, Tuple
+
+DATA_DIRECTORY = Path(__file__).resolve().parents[1] / "data"
+DATABASE_PATH = DATA_DIRECTORY / "app.db"
+
+# Serializes writers only; read paths never touch it. SQLite's own file
+# locking plus busy_timeout would cope with write contention, but all
+# writes share the one writer connection, so the lock also keeps
+# multi-statement transactions (BEGIN ... COMMIT) from interleaving.
+_WRITE_LOCK = Lock()
+
+class DatabaseError(RuntimeError):
+    """Raised when a database operation fails."""
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the shared SQLite connection and apply performance pragmas."""
+
+    DATA_DIRECTORY.mkdir(parents=True, exist_ok=True)
+
+    # One long-lived connection avoids paying the
+    # open/parse-schema cost of sqlite3.connect on every operation. WAL with
+    # synchronous=NORMAL keeps commits durable enough for a local task store
+    # while cutting the fsync cost per write.
+    # cached_statements keeps prepared statements alive per connection; the
+    # module-level SQL constants give the cache stable keys, so the hot
+    # queries are tokenized and planned once per connection, not per call.
+    connection = sqlite3.connect(
+        DATABASE_PATH,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=256,
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    connection.execute("PRAGMA cache_size=-64000")
+    # Retry inside SQLite on transient SQLITE_BUSY instead of surfacing it
+    # to callers as a DatabaseError.
+    connection.execute("PRAGMA busy_timeout=30000")
+    return connection
+
+
+_READ_POOL_SIZE = 4
+
+
+class _ConnectionPool:
+    """A dedicated writer connection plus a small pool of readers.
+
+    Under WAL a single writer runs alongside many readers, but the sqlite3
+    module serializes statements per connection; separate reader
+    connections let fetches run truly concurrently while each connection's
+    page cache stays warm across requests.
+    """
+
+    def __init__(self, readers: int = _READ_POOL_SIZE) -> None:
+        self.writer = _connect()
+        self._readers: Queue[sqlite3.Connection] = Queue(maxsize=readers)
+        for _ in range(readers):
+            self._readers.put(_connect())
+
+    @contextmanager
+    def read(self):
+        connection = self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put(connection)
+
+    def close(self) -> None:
+        try:
+            # Let SQLite refresh planner statistics before shutdown, as
+            # recommended for long-lived connections.
+            self.writer.execute("PRAGMA optimize")
+        except sqlite3.Error:  # pragma: no cover - defensive
+            pass
+        self.writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+
+_POOL: _ConnectionPool | None = None
+_POOL_LOCK = Lock()
+
+
+def _get_pool() -> _ConnectionPool:
+    """Return the shared pool, opening the connections on first use.
+
+    Lazy initialization keeps module import free of filesystem side effects
+    and ensures pre-forking servers open their connections per worker
+    instead of inheriting the parent's file descriptors.
+    """
+
+    global _POOL
+    pool = _POOL
+    if pool is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = _ConnectionPool()
+            pool = _POOL
+    return pool
+
+
+def reset_pool() -> None:
+    """Forget the shared pool so the next use opens fresh connections.
+
+    The inherited connection objects are deliberately not closed: after a
+    fork they wrap the parent's file descriptors, which the child must not
+    touch.
+    """
+
+    global _POOL
+    with _POOL_LOCK:
+        _POOL = None
+
+
+def _close_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+
+os.register_at_fork(after_in_child=reset_pool)
+atexit.register(_close_pool)
+
+@contextmanager
+def _tx(connection: sqlite3.Connection):
+    """Run a block as one explicit BEGIN IMMEDIATE ... COMMIT transaction.
+
+    Grouping several statements under a single commit means one WAL fsync
+    for the whole unit instead of one per statement. Rolls back and
+    re-raises if the block fails. Callers must hold _WRITE_LOCK.
+    """
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+_INITIALIZED = False
+
+# SQL statements hoisted to module scope: built once, and the stable string
+# identity keeps sqlite3's per-connection statement cache hitting.
+_UPSERT_USER_SQL = """
+    INSERT INTO users (sub, email, name, given_name, family_name, picture, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT(sub) DO UPDATE SET
+        email=excluded.email,
+        name=excluded.name,
+        given_name=excluded.given_name,
+        family_name=excluded.family_name,
+        picture=excluded.picture,
+        updated_at=CURRENT_TIMESTAMP
+"""
+
+# RETURNING (SQLite >= 3.35) hands the new id back in the statement result
+# itself, instead of a separate lastrowid read after the insert.
+_INSERT_TASK_SQL = (
+    "INSERT INTO tasks (description, date, time, user_email, isactive) "
+    "VALUES (?, ?, ?, ?, 1) RETURNING id"
+)
+
+_FETCH_TASKS_SQL = (
+    "SELECT id, description, date, time, user_email "
+    "FROM tasks WHERE user_email = ? AND date = ? AND isactive = 1 "
+    "ORDER BY time, id"
+)
+
+_DEACTIVATE_TASK_SQL = (
+    "UPDATE tasks SET isactive = 0 WHERE id = ? AND isactive = 1 RETURNING id"
+)
+
+# All startup DDL in one script: a single parse pass instead of one
+# round-trip per statement. The partial index covers the hot fetch —
+# equality on (user_email, date) with trailing (time, id) columns satisfying
+# the ORDER BY straight from the index — while excluding deactivated rows,
+# which only ever accumulate, so the index stays small. It supersedes the
+# earlier full index over the same columns.
+_SCHEMA_SCRIPT = """
+    CREATE TABLE IF NOT EXISTS users (
+        sub TEXT PRIMARY KEY,
+        email TEXT,
+        name TEXT,
+        given_name TEXT,
+        family_name TEXT,
+        picture TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        user_email TEXT NOT NULL,
+        isactive INTEGER NOT NULL DEFAULT 1
+    );
+    DROP INDEX IF EXISTS idx_tasks_user_date_active_time;
+    CREATE INDEX IF NOT EXISTS idx_tasks_active_user_date
+    ON tasks(user_email, date, time, id) WHERE isactive = 1;
+"""
+
+
+def init_db() -> None:
+    """Ensure the SQLite database and schema exist."""
+
+    global _INITIALIZED
+    if _INITIALIZED:
+        return
+
+    with _WRITE_LOCK:
+        _get_pool().writer.executescript(_SCHEMA_SCRIPT)
+        _INITIALIZED = True
+
+
+# Fingerprints of the last-written profile per subject. A returning user
+# whose Cognito profile has not changed costs a dict lookup instead of an
+# UPSERT (and its fsync) on every verify.
+_USER_HASH_CACHE: Dict[str, bytes] = {}
+_USER_CACHE_LOCK = Lock()
+
+
+def upsert_user(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Insert or update a user record using the Cognito payload.
+
+    The write is skipped when the profile fields match what was last
+    written for the subject; only users.updated_at goes stale in that
+    case, which nothing reads on the hot path.
+    """
+
+    sub = payload.get("sub")
+    if not sub:
+        raise ValueError("ID token payload did not include a subject identifier.")
+
+    user = {
+        "sub": sub,
+        "email": payload.get("email"),
+        "name": payload.get("name"),
+        "given_name": payload.get("given_name"),
+        "family_name": payload.get("family_name"),
+        "picture": payload.get("picture"),
+    }
+
+    profile_hash = hashlib.blake2b(
+        json.dumps(user, sort_keys=True, default=str).encode(), digest_size=16
+    ).digest()
+    with _USER_CACHE_LOCK:
+        unchanged = _USER_HASH_CACHE.get(sub) == profile_hash
+    if unchanged:
+        return user
+
+    with _WRITE_LOCK:
+        _get_pool().writer.execute(
+            _UPSERT_USER_SQL,
+            (
+                user["sub"],
+                user["email"],
+                user["name"],
+                user["given_name"],
+                user["family_name"],
+                user["picture"],
+            ),
+        )
+
+    with _USER_CACHE_LOCK:
+        _USER_HASH_CACHE[sub] = profile_hash
+
+    return user
+
+
+def insert_tasks(rows: List[Dict[str, Any]]) -> List[int]:
+    """Insert multiple task rows in a single transaction.
+
+    Each row is a mapping with ``description``, ``date``, ``time`` and an
+    optional ``user_email``. Returns the new row identifiers in input order.
+    """
+
+    if not rows:
+        return []
+
+    task_ids: List[int] = []
+    try:
+        with _WRITE_LOCK:
+            with _tx(_get_pool().writer) as connection:
+                for row in rows:
+                    # Parameter binding avoids SQL injection by keeping user
+                    # input separate from the SQL statement itself.
+                    cursor = connection.execute(
+                        _INSERT_TASK_SQL,
+                        (
+                            row["description"],
+                            row["date"],
+                            row["time"],
+                            (row.get("user_email") or "").strip(),
+                        ),
+                    )
+                    task_ids.append(cursor.fetchone()[0])
+    except sqlite3.Error as exc:  # pragma: no cover - defensive
+        raise DatabaseError("Failed to insert tasks") from exc
+
+    return task_ids
+
+
+def insert_task(
+    description: str,
+    task_date: str,
+    task_time: str,
+    user_email: str | None,
+) -> Tuple[int, str | None]:
+    """Insert a task row and return its identifier and normalized email."""
+
+    normalized_email = (user_email or "").strip()
+    task_ids = insert_tasks(
+        [
+            {
+                "description": description,
+                "date": task_date,
+                "time": task_time,
+                "user_email": normalized_email,
+            }
+        ]
+    )
+
+    return task_ids[0], (normalized_email or None)
+
+
+def fetch_tasks_by_email_and_date(
+    user_email: str,
+    task_date: str,
+) -> List[Dict[str, Any]]:
+    """Retrieve the active tasks for a user on a specific date."""
+
+    normalized_email = user_email.strip()
+    if not normalized_email:
+        return []
+
+    # Iterate the cursor directly: sqlite3 streams rows on demand, so the
+    # raw tuples are never all live at once — only the final dicts are
+    # materialized. Column order matches _FETCH_TASKS_SQL.
+    try:
+        with _get_pool().read() as connection:
+            cursor = connection.execute(_FETCH_TASKS_SQL, (normalized_email, task_date))
+            return [
+                {
+                    "id": row[0],
+                    "description": row[1],
+                    "date": row[2],
+                    "time": row[3],
+                    "user_email": row[4] or None,
+                }
+                for row in cursor
+            ]
+    except sqlite3.Error as exc:  # pragma: no cover - defensive
+        raise DatabaseError("Failed to fetch tasks") from exc
+
+
+
+def deactivate_task(task_id: int) -> bool:
+    """Mark a task as inactive.
+
+    Returns ``True`` when a row is updated and ``False`` when no matching task
+    exists.
+    """
+    
+    # Autocommit mode keeps this a single-statement implicit transaction;
+    # RETURNING confirms the hit in the statement result itself, so there
+    # is no rowcount bookkeeping after the fact.
+    try:
+        with _WRITE_LOCK:
+            deactivated = (
+                _get_pool().writer.execute(_DEACTIVATE_TASK_SQL, (task_id,)).fetchone()
+                is not None
+            )
+    except sqlite3.Error as exc:  # pragma: no cover - defensive
+        raise DatabaseError("Failed to delete task") from exc
+
+    return deactivated
\ No newline at end of file